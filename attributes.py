@@ -40,33 +40,38 @@ class AttributeSchemaEncoder:
 
   def __init__(self, pretyped_attributes={}, write_nulls=False):
     self.write_nulls = write_nulls
+    # per instance, so that the schema is carried along when the encoder is pickled to worker processes
+    self.schema = {}
+    self.pretyped_names = set(pretyped_attributes.keys())
     for key, value in pretyped_attributes.items():
       self.schema[key] = self.Column(value, len(self.schema))
-      self.pretyped_names = pretyped_attributes.keys()
 
   def add(self, attributes, exclude=[]):
     for key, value in attributes.items():
       if key in exclude:
         continue
-      if key in self.pretyped_names:
-        continue
-      if key not in self.schema:
-        self.schema[key] = self.Column(type(value), len(self.schema))
-      else:
-        t_val = type(value)
-        t_schema = self.schema[key].type
-        if t_val != t_schema:
-          if t_schema == None:
-            self.schema[key] = self.Column(t_val, len(self.schema))
-          elif t_val == float and t_schema == int:
-            self.schema[key] = self.Column(float, len(self.schema))
-            logging.warning("Type mismatch for column " + key + ". Overwriting schema type to float")
-          elif t_val == int and t_schema == bool:
-            self.schema[key] = self.Column(int, len(self.schema))
-            logging.warning("Type mismatch for column " + key + ". Overwriting schema type to int")
-          elif t_val == str and t_schema == int:
-            self.schema[key] = self.Column(str, len(self.schema))
-            logging.warning("Type mismatch for column " + key + ". Overwriting schema type to string")
+      self.add_type(key, type(value))
+
+  # add a single (name, type) observation to the schema, ie. what add() does for each attribute value
+  def add_type(self, key, t_val):
+    if key in self.pretyped_names:
+      return
+    if key not in self.schema:
+      self.schema[key] = self.Column(t_val, len(self.schema))
+    else:
+      t_schema = self.schema[key].type
+      if t_val != t_schema:
+        if t_schema == None:
+          self.schema[key] = self.Column(t_val, len(self.schema))
+        elif t_val == float and t_schema == int:
+          self.schema[key] = self.Column(float, len(self.schema))
+          logging.warning("Type mismatch for column " + key + ". Overwriting schema type to float")
+        elif t_val == int and t_schema == bool:
+          self.schema[key] = self.Column(int, len(self.schema))
+          logging.warning("Type mismatch for column " + key + ". Overwriting schema type to int")
+        elif t_val == str and t_schema == int:
+          self.schema[key] = self.Column(str, len(self.schema))
+          logging.warning("Type mismatch for column " + key + ". Overwriting schema type to string")
 
   def get_cb_column_type(self, name):
     if self.schema[name].type == str:
@@ -126,12 +131,18 @@ class AttributeSchemaEncoder:
       return struct.pack(format, self.schema[name].order, value)
 
   def encode_values(self, attributes, exclude=[]):
-    buf = b""
+    buf = bytearray()
+    self.encode_values_into(attributes, buf, exclude)
+    return bytes(buf)
+
+  # same as encode_values, but appends to the bytearray out instead of returning bytes. Returns the number of bytes written
+  def encode_values_into(self, attributes, out, exclude=[]):
+    start = len(out)
     for key, value in attributes.items():
       if key in exclude:
         continue
-      buf += self.encode_value(key, value, self.write_nulls)
-    return buf
+      out += self.encode_value(key, value, self.write_nulls)
+    return len(out) - start
 
 class AttributeSchemaDecoder:
   schema = {}
@@ -19,7 +19,9 @@
 # Author(s): 
 # Ravi Peters
 
-import json, argparse, logging
+import argparse, logging, itertools, struct, functools, os
+import concurrent.futures
+import orjson
 import numpy as np
 
 from CityBuf_ import \
@@ -33,7 +35,7 @@ from CityBuf_ import \
 from CityBuf_.SemanticSurfaceType import SemanticSurfaceType
 from CityBuf_.CityObjectType import CityObjectType
 from CityBuf_.GeometryType import GeometryType
-from CityBuf_.Vertex import CreateVertex
+from CityBuf_.Vertex import Vertex
 from CityBuf_.Transform import CreateTransform
 from CityBuf_.GeographicalExtent import CreateGeographicalExtent
 import flatbuffers
@@ -41,103 +43,162 @@ import flatbuffers
 from attributes import AttributeSchemaEncoder
 from geometry import GeometryEncoder
 
+# number of features handed to the worker pool at a time, this keeps memory bounded since Executor.map would otherwise submit the whole input up front
+POOL_BATCH_SIZE = 1024
+
+# number of object extents that are collected before reducing them into the global extent
+EXTENT_BATCH_SIZE = 65536
+
+# the Uint32 length prefix of the header and feature records
+LENGTH_PREFIX = struct.Struct('<I')
+
+# size of the output write buffer, large enough to batch many small features into a single write syscall
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# collect size statistics of the encoded features, only works when encoding in the main process (ie. with jobs=1)
+DEBUG_STATS = False
+
+class Stats:
+  def __init__(self):
+    self.feature_count = 0
+    self.vertex_size = 0
+    self.geometry_size = 0
+    self.attributes_size = 0
+    self.indices_size = 0
+    self.indices_count = 0
+    self.semantics_size = 0
+    self.boundaries_size = 0
+
+stats = Stats()
+
+@functools.lru_cache(maxsize=8)
 def create_magic_bytes(major=0, minor=2):
   cb = "FCB".encode('ascii')
   ma = major.to_bytes(1, byteorder='little')
   mi = minor.to_bytes(1, byteorder='little')
 
-  # Convert ASCII string to bytes
-  print (cb + ma + cb + mi)
   return cb + ma + cb + mi
 
-def get_attribute_by_name(class_type, attribute_name):
-    return getattr(class_type, attribute_name, None)
+# name to value maps of the generated enums, so the hot path only needs a dict lookup
+def get_enum_map(class_type):
+  return {name: value for name, value in vars(class_type).items() if not name.startswith('_')}
+
+SEMANTIC_TYPE_MAP = get_enum_map(SemanticSurfaceType)
+CITYOBJECT_TYPE_MAP = get_enum_map(CityObjectType)
+GEOMETRY_TYPE_MAP = get_enum_map(GeometryType)
+
+# Vertex is a fixed size struct of 3 int32s, so the whole vertices vector can be copied into the builder in one go.
+# The dtype is checked before casting, since casting would silently truncate non-integer (eg. untransformed) vertices
+def create_vertices_vector(builder, vertices):
+  verts = np.asarray(vertices)
+  if len(verts) and verts.dtype.kind not in 'iu':
+    raise Exception("Vertices must be [x, y, z] integer triplets")
+  verts = verts.astype('<i4', copy=False)
+  if len(verts) and (verts.ndim != 2 or verts.shape[1] * verts.itemsize != Vertex.SizeOf()):
+    raise Exception("Vertices must be [x, y, z] integer triplets")
+  CityFeature.StartVerticesVector(builder, len(verts))
+  builder.head -= verts.nbytes
+  builder.Bytes[builder.head:builder.head + verts.nbytes] = verts.tobytes()
+  return builder.EndVector()
+
+# writes a [uint] vector with a single memcpy instead of prepending the values one by one
+def create_uint32_vector(builder, values):
+  arr = np.asarray(values, dtype='<u4')
+  builder.StartVector(4, len(arr), 4)
+  builder.head -= arr.nbytes
+  builder.Bytes[builder.head:builder.head + arr.nbytes] = arr.tobytes()
+  return builder.EndVector()
+
+# writes a [ubyte] vector from any buffer (bytes, bytearray or memoryview) with a single memcpy, unlike
+# builder.CreateByteVector this also accepts a memoryview slice of a larger buffer without copying it first
+def create_byte_vector(builder, buf):
+  n = len(buf)
+  builder.StartVector(1, n, 1)
+  builder.head -= n
+  builder.Bytes[builder.head:builder.head + n] = buf
+  return builder.EndVector()
+
+# the attribute values are encoded into a bytearray that is copied into the builder as is, instead of first being
+# converted to bytes
+def create_attributes_vector(builder, schema_encoder, attributes, exclude=[]):
+  buf = bytearray()
+  schema_encoder.encode_values_into(attributes, buf, exclude)
+  return create_byte_vector(builder, buf)
+
+# this loop runs for every semantic surface, so the generated SemanticObject functions are bound to locals. The
+# SemanticObjectXxx variants are used since the short Start/AddType/.. names are wrappers that add another call
+def create_semantic_objects(builder, surfaces, schema_encoder):
+  start = SemanticObject.SemanticObjectStart
+  add_type = SemanticObject.SemanticObjectAddType
+  add_attributes = SemanticObject.SemanticObjectAddAttributes
+  end = SemanticObject.SemanticObjectEnd
+
+  f_semantics_offsets = []
+  for surface in surfaces:
+    f_attributes_offset = create_attributes_vector(builder, schema_encoder, surface, exclude=["type"])
+    start(builder)
+    add_type(builder, SEMANTIC_TYPE_MAP.get(surface["type"]))
+    add_attributes(builder, f_attributes_offset)
+    f_semantics_offsets.append(end(builder))
+
+  Geometry.StartSemanticsObjectsVector(builder, len(f_semantics_offsets))
+  for offset in reversed(f_semantics_offsets):
+    builder.PrependUOffsetTRelative(offset)
+  return builder.EndVector()
 
-def create_feature(cj_feature, schema_encoder=None):
+def create_feature(cj_feature, schema_encoder=None, builder_size=1024):
   def create_object(builder, cj_id, cj_object, schema_encoder):
 
     def create_geometry(builder, geom):
-      f_lod = builder.CreateString(geom["lod"])
+      f_lod = builder.CreateSharedString(geom["lod"]) # LoD values come from a small vocabulary, so share them within the feature
 
       semantic_values = None
       if "semantics" in geom:
         semantics = geom["semantics"]
-        global total_semantics_size
-        o = builder.Offset()
-        f_semantics_offsets = []
+        if DEBUG_STATS:
+          o = builder.Offset()
         if "surfaces" in semantics and "values" in semantics:
-          for surface in semantics["surfaces"]:
-            f_attributes_offset = builder.CreateByteVector( schema_encoder.encode_values(surface, exclude=["type"]) )
-            SemanticObject.Start(builder)
-            SemanticObject.SemanticObjectAddType(builder, get_attribute_by_name(SemanticSurfaceType, surface["type"]))
-            SemanticObject.SemanticObjectAddAttributes(builder, f_attributes_offset)
-            f_semantics_offsets.append(SemanticObject.End(builder))
-
-          Geometry.StartSemanticsObjectsVector(builder, len(f_semantics_offsets))
-          for offset in reversed(f_semantics_offsets):
-            builder.PrependUOffsetTRelative(offset)
-          f_semantics_objects = builder.EndVector()
-          total_semantics_size += (builder.Offset() - o)
+          f_semantics_objects = create_semantic_objects(builder, semantics["surfaces"], schema_encoder)
+          if DEBUG_STATS:
+            stats.semantics_size += (builder.Offset() - o)
           semantic_values = semantics["values"]
 
         else:
           raise Exception("Semantics must have surfaces and values")
 
       # Create the boundaries field
-      global total_boundaries_size
-      o = builder.Offset()
-      
       gd = GeometryEncoder()
       gd.encode(geom["boundaries"])
       if semantic_values:
         gd.encode_semantics(semantic_values)
       
-      global total_indices_size, total_indices_count
-      o = builder.Offset()
-      Geometry.StartBoundariesVector(builder, len(gd.indices))
-      for index in reversed(gd.indices):
-        builder.PrependUint32(index)
-      f_boundaries_offset = builder.EndVector()
-      total_indices_size += (builder.Offset() - o)
-      total_indices_count += len(gd.indices)
+      if DEBUG_STATS:
+        o = builder.Offset()
+      f_boundaries_offset = create_uint32_vector(builder, gd.indices)
+      if DEBUG_STATS:
+        stats.indices_size += (builder.Offset() - o)
+        stats.indices_count += len(gd.indices)
 
       if len(gd.solids):
-        Geometry.StartSolidsVector(builder, len(gd.solids))
-        for solid in reversed(gd.solids):
-          builder.PrependUint32(solid)
-        f_solids_offset = builder.EndVector()
+        f_solids_offset = create_uint32_vector(builder, gd.solids)
 
       if len(gd.shells):
-        Geometry.StartShellsVector(builder, len(gd.shells))
-        for shell in reversed(gd.shells):
-          builder.PrependUint32(shell)
-        f_shells_offset = builder.EndVector()
+        f_shells_offset = create_uint32_vector(builder, gd.shells)
 
       if len(gd.surfaces):
-        Geometry.StartSurfacesVector(builder, len(gd.surfaces))
-        for surface in reversed(gd.surfaces):
-          builder.PrependUint32(surface)
-        f_surfaces_offset = builder.EndVector()
+        f_surfaces_offset = create_uint32_vector(builder, gd.surfaces)
 
       if len(gd.strings):
-        Geometry.StartStringsVector(builder, len(gd.strings))
-        for ring in reversed(gd.strings):
-          builder.PrependUint32(ring)
-        f_rings_offset = builder.EndVector()
+        f_rings_offset = create_uint32_vector(builder, gd.strings)
 
       if len(gd.semantic_values):
-        Geometry.StartSemanticsVector(builder, len(gd.semantic_values))
-        for sem in reversed(gd.semantic_values):
-          if sem is None: # in case of None (no semantic object), use the maximum value of uint32
-            builder.PrependUint32(np.iinfo(np.uint32).max)
-          else:
-            builder.PrependUint32(sem)
-        f_semantics = builder.EndVector()
-
-      total_boundaries_size += (builder.Offset() - o)
+        f_semantics = create_uint32_vector(builder, gd.semantic_values)
+
+      if DEBUG_STATS:
+        stats.boundaries_size += (builder.Offset() - o)
       
       Geometry.Start(builder)
-      Geometry.GeometryAddType(builder, get_attribute_by_name(GeometryType, geom["type"]))
+      Geometry.GeometryAddType(builder, GEOMETRY_TYPE_MAP.get(geom["type"]))
       Geometry.GeometryAddLod(builder, f_lod)
       if len(gd.solids):
         Geometry.GeometryAddSolids(builder, f_solids_offset)
@@ -160,43 +221,39 @@ def create_feature(cj_feature, schema_encoder=None):
     has_geometry = "geometry" in cj_object
     has_geographical_extent = "geographicalExtent" in cj_object
 
-    f_id = builder.CreateString(cj_id)
+    f_id = builder.CreateSharedString(cj_id)
 
     # create attributes
     if has_attributes and schema_encoder:
-      global total_attributes_size
-      o = builder.Offset()
+      if DEBUG_STATS:
+        o = builder.Offset()
       # iterate of object attributes and build a binary buffer; the attribute values encoded back to back, each preceded by a column index
-      buf_attributes = schema_encoder.encode_values(cj_object["attributes"])
-      f_attributes_offset = builder.CreateByteVector(buf_attributes)
-      total_attributes_size += (builder.Offset() - o)
+      f_attributes_offset = create_attributes_vector(builder, schema_encoder, cj_object["attributes"])
+      if DEBUG_STATS:
+        stats.attributes_size += (builder.Offset() - o)
 
     # create parent string
     if has_parents:
-      f_parents = []
-      for parent in reversed(cj_object["parents"]):  # FlatBuffers requires reverse order when creating vectors
-        f_parents.append(builder.CreateString(parent))
+      f_parents = [builder.CreateSharedString(parent) for parent in cj_object["parents"]]
 
       CityObject.StartParentsVector(builder, len(f_parents))
-      for parent in f_parents:
+      for parent in reversed(f_parents):  # FlatBuffers requires reverse order when creating vectors
         builder.PrependUOffsetTRelative(parent)
       f_parents_offset = builder.EndVector()
 
     # create children strings vector
     if has_children:
-      f_children = []
-      for child in reversed(cj_object["children"]):  # FlatBuffers requires reverse order when creating vectors
-        f_children.append(builder.CreateString(child))
+      f_children = [builder.CreateSharedString(child) for child in cj_object["children"]]
 
       CityObject.StartChildrenVector(builder, len(f_children))
-      for child in f_children:
+      for child in reversed(f_children):  # FlatBuffers requires reverse order when creating vectors
         builder.PrependUOffsetTRelative(child)
       f_children_offset = builder.EndVector()
 
     # create geometries
     if has_geometry:
-      global total_geometry_size
-      o = builder.Offset()
+      if DEBUG_STATS:
+        o = builder.Offset()
       f_geoms = []
       for geom in cj_object["geometry"]:
         if geom["type"] == "GeometryInstance":
@@ -208,11 +265,12 @@ def create_feature(cj_feature, schema_encoder=None):
       for geom in reversed(f_geoms):  # FlatBuffers requires reverse order when creating vectors
         builder.PrependUOffsetTRelative(geom)
       f_geometries_offset = builder.EndVector()
-      total_geometry_size += (builder.Offset() - o)
+      if DEBUG_STATS:
+        stats.geometry_size += (builder.Offset() - o)
     
     CityObject.Start(builder)
     # type
-    CityObject.AddType(builder, get_attribute_by_name(CityObjectType, cj_object["type"]))
+    CityObject.AddType(builder, CITYOBJECT_TYPE_MAP.get(cj_object["type"]))
     # id
     CityObject.AddId(builder, f_id)
 
@@ -234,27 +292,22 @@ def create_feature(cj_feature, schema_encoder=None):
 
     # geographical extent
     if has_geographical_extent:
-
-      gextent = np.ndarray((2, 3), dtype=np.float64)
-      gextent[0] = cj_object["geographicalExtent"][0:3]
-      gextent[1] = cj_object["geographicalExtent"][3:6]
-      CityObject.AddGeographicalExtent(builder,  CreateGeographicalExtent(builder, gextent[0][0], gextent[0][1], gextent[0][2], gextent[1][0], gextent[1][1], gextent[1][2]))
+      ge = cj_object["geographicalExtent"]
+      CityObject.AddGeographicalExtent(builder, CreateGeographicalExtent(builder, ge[0], ge[1], ge[2], ge[3], ge[4], ge[5]))
 
     return CityObject.End(builder)
 
-  builder = flatbuffers.Builder(1024)
+  builder = flatbuffers.Builder(builder_size)
 
-  f_id = builder.CreateString(cj_feature["id"])
+  f_id = builder.CreateSharedString(cj_feature["id"])
   
   # should check if type is CityJSONFeature
 
-  o_init = builder.Offset()
-  CityFeature.StartVerticesVector(builder, len(cj_feature["vertices"]))
-  for v in reversed(cj_feature["vertices"]):  # FlatBuffers requires reverse order when creating vectors
-      CreateVertex(builder, v[0], v[1], v[2])
-  f_vertices_offset = builder.EndVector()
-  global total_vertex_size
-  total_vertex_size += (builder.Offset() - o_init)
+  if DEBUG_STATS:
+    o_init = builder.Offset()
+  f_vertices_offset = create_vertices_vector(builder, cj_feature["vertices"])
+  if DEBUG_STATS:
+    stats.vertex_size += (builder.Offset() - o_init)
 
   f_object_offsets = []
   for (cj_id, cj_object) in cj_feature["CityObjects"].items():
@@ -277,8 +330,8 @@ def create_feature(cj_feature, schema_encoder=None):
   return builder.Output()
 
 def create_header(cj_metadata, geographical_extent, features_count=3, schema_encoder=None):
-  # Create a FlatBuffer builder
-  builder = flatbuffers.Builder(1024)
+  # Create a FlatBuffer builder, with some room for each column
+  builder = flatbuffers.Builder(1024 + 64 * len(schema_encoder.schema))
 
   # Create the transform object in the buffer
   ts = cj_metadata['transform']['scale']
@@ -331,19 +384,95 @@ def create_header(cj_metadata, geographical_extent, features_count=3, schema_enc
 
   return builder.Output()
 
-def convert_cjseq2cb(cjseq_path, cb_path, pretyped_attributes={}, write_nulls=True):
-  cj_features = []
-  with open(cjseq_path, "r") as fo:
-    cj_metadata = json.loads(fo.readline())
+# grows global_extent in place to include a list of [minx, miny, minz, maxx, maxy, maxz] extents
+def update_extent(global_extent, extents):
+  if len(extents):
+    arr = np.asarray(extents, dtype=np.float64)
+    global_extent[0] = np.minimum(global_extent[0], arr[:, 0:3].min(axis=0))
+    global_extent[1] = np.maximum(global_extent[1], arr[:, 3:6].max(axis=0))
+
+def read_metadata(cjseq_path):
+  with open(cjseq_path, "rb") as fo:
+    return orjson.loads(fo.readline())
+
+# yields one feature line at a time, so that we never hold more than one feature in memory
+def iter_feature_lines(cjseq_path):
+  with open(cjseq_path, "rb") as fo:
+    fo.readline() # skip the metadata line
     for feature_str in fo:
-        cj_features.append(json.loads(feature_str))
+      yield feature_str
+
+# parses a feature and returns what the first pass needs from it: the geographical extents of its objects (if
+# collect_extents is set) and the (name, type) pairs of its attributes in order of appearance. All pairs are kept,
+# since the resulting schema type depends on the order in which the types are seen
+def scan_feature(feature_str, collect_extents=True):
+  cj_feature = orjson.loads(feature_str)
+  extents = []
+  attribute_types = []
+  for cj_object in cj_feature["CityObjects"].values():
+    if collect_extents and "geographicalExtent" in cj_object:
+      extents.append(cj_object["geographicalExtent"])
+
+    if "attributes" in cj_object:
+      for key, value in cj_object["attributes"].items():
+        attribute_types.append((key, type(value)))
+
+    if "geometry" in cj_object:
+      for geom in cj_object["geometry"]:
+        if "semantics" in geom:
+          for surface in geom["semantics"]["surfaces"]:
+            for key, value in surface.items():
+              if key not in ("type", "parent", "children"):
+                attribute_types.append((key, type(value)))
+  return extents, attribute_types
+
+# yields func(feature_str) for every feature line in input order. If an executor is given the features are processed
+# in its worker processes, the caller owns the executor and is responsible for shutting it down
+def map_feature_lines(func, cjseq_path, executor=None):
+  if executor:
+    feature_strs = iter_feature_lines(cjseq_path)
+    while batch := list(itertools.islice(feature_strs, POOL_BATCH_SIZE)):
+      yield from executor.map(func, batch, chunksize=64)
+  else:
+    for feature_str in iter_feature_lines(cjseq_path):
+      yield func(feature_str)
+
+# returns a pool of jobs worker processes, or None if jobs == 1 in which case the initializer is run in this process
+def create_executor(jobs, initializer=None, initargs=()):
+  if jobs > 1:
+    return concurrent.futures.ProcessPoolExecutor(jobs, initializer=initializer, initargs=initargs)
+  if initializer:
+    initializer(*initargs)
+  return None
+
+# cancels the features that are not yet encoded (eg. after one of them failed) and waits for the workers to exit
+def shutdown_executor(executor):
+  if executor:
+    executor.shutdown(wait=True, cancel_futures=True)
 
-  global total_feature_count
-  total_feature_count = len(cj_features)
+# initial size for the feature builder, so it does not need to grow (and copy its buffer) while encoding.
+# The encoded feature is typically a bit smaller than its JSON representation
+def estimate_builder_size(feature_str):
+  return max(1024, len(feature_str))
+
+# set once per worker process by init_worker, to avoid pickling the schema encoder for every feature
+worker_schema_encoder = None
+
+def init_worker(schema_encoder):
+  global worker_schema_encoder
+  worker_schema_encoder = schema_encoder
+
+def encode_feature(feature_str):
+  return create_feature(orjson.loads(feature_str), worker_schema_encoder, estimate_builder_size(feature_str))
+
+def convert_cjseq2cb(cjseq_path, cb_path, pretyped_attributes={}, write_nulls=True, jobs=1):
+  cj_metadata = read_metadata(cjseq_path)
+
+  # reset all counters, so they do not add up over multiple conversions
+  stats.__init__()
 
   schema_encoder = AttributeSchemaEncoder(pretyped_attributes, write_nulls)
 
-  # scan attributes and geographical extents
   global_extent = np.ndarray((2, 3), dtype=np.float64)
   get_extent_from_features = True
   if "metadata" in cj_metadata:
@@ -354,43 +483,51 @@ def convert_cjseq2cb(cjseq_path, cb_path, pretyped_attributes={}, write_nulls=Tr
     else:
       global_extent[0] = np.inf
       global_extent[1] = -np.inf
-  for cj_feature in cj_features:
-    for cj_object in cj_feature["CityObjects"].values():
+  # first pass: scan attributes and geographical extents, the features are parsed in the workers if jobs > 1
+  extents = []
+  executor = create_executor(jobs)
+  try:
+    for feature_extents, attribute_types in map_feature_lines(functools.partial(scan_feature, collect_extents=get_extent_from_features), cjseq_path, executor):
+      stats.feature_count += 1
       if get_extent_from_features:
-        if "geographicalExtent" in cj_object:
-          fext = np.ndarray((2, 3), dtype=np.float64)
-          fext[0] = cj_object["geographicalExtent"][0:3]
-          fext[1] = cj_object["geographicalExtent"][3:6]
-          global_extent[0] = np.minimum(global_extent[0], fext[0])
-          global_extent[1] = np.maximum(global_extent[1], fext[1])
-
-      if "attributes" in cj_object:
-        schema_encoder.add(cj_object["attributes"])
-
-      if "geometry" in cj_object:
-        for geom in cj_object["geometry"]:
-          if "semantics" in geom:
-            for surface in geom["semantics"]["surfaces"]:
-                schema_encoder.add(surface, exclude=["type", "parent", "children"])
+        extents += feature_extents
+        if len(extents) >= EXTENT_BATCH_SIZE:
+          update_extent(global_extent, extents)
+          extents.clear()
+
+      for key, t_val in attribute_types:
+        schema_encoder.add_type(key, t_val)
+  finally:
+    shutdown_executor(executor)
+  update_extent(global_extent, extents)
 
   print("Using schema:")
   for name, value in schema_encoder.schema.items():
     print(f"\t{name}, {value.type}")
 
-  fb_features = []
-  for cj_feature in cj_features:
-    fb_features.append(create_feature(cj_feature, schema_encoder))
-
-  # Open a file in binary write mode
-  with open(cb_path, 'wb') as file:
-    # Write the byte data to the file
-    file.write(create_magic_bytes(0,4))
-    header_buf = create_header(cj_metadata, geographical_extent=global_extent, features_count=len(fb_features), schema_encoder=schema_encoder)
-    file.write(len(header_buf).to_bytes(4, byteorder='little', signed=False))
-    file.write(header_buf)
-    for fb_feature in fb_features:
-      file.write(len(fb_feature).to_bytes(4, byteorder='little', signed=False))
-      file.write(fb_feature)
+  # Write to a temporary file next to cb_path, and only move it into place once all features are encoded. The header
+  # (with the features count from the first pass) is written before the features, so a feature that fails to encode
+  # would otherwise leave a truncated file behind
+  tmp_path = os.fspath(cb_path) + ".tmp"
+  # the workers of the second pass get the final schema encoder
+  executor = create_executor(jobs, initializer=init_worker, initargs=(schema_encoder,))
+  try:
+    with open(tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as file:
+      # Write the byte data to the file
+      file.write(create_magic_bytes(0,4))
+      header_buf = create_header(cj_metadata, geographical_extent=global_extent, features_count=stats.feature_count, schema_encoder=schema_encoder)
+      file.writelines((LENGTH_PREFIX.pack(len(header_buf)), header_buf))
+
+      # second pass: encode and write the features one by one. The feature lines are parsed again rather than spilling
+      # the parsed features to disk in the first pass, since orjson parses a feature about as fast as msgpack unpacks it
+      for fb_feature in map_feature_lines(encode_feature, cjseq_path, executor):
+        # write the length prefix and the feature in one go
+        file.writelines((LENGTH_PREFIX.pack(len(fb_feature)), fb_feature))
+    os.replace(tmp_path, cb_path)
+  finally:
+    shutdown_executor(executor)
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
 
 if __name__ == "__main__":
   arg = argparse.ArgumentParser(description='Convert CityJSON sequence to CityBuffer')
@@ -398,6 +535,8 @@ if __name__ == "__main__":
   arg.add_argument('cb', help='CityBuffer file')
   arg.add_argument('--schema', help='Explicitly specify attribute types, important in case type cannot be unambiguously inferred from the data. Give as comma seprarated name:type pairs. Example: attr_name_a:bool,attr_name_b:int', type=str)
   arg.add_argument('--skip-null_attributes', help='Do not encode attributes with a null value', action='store_true')
+  arg.add_argument('--jobs', help='Number of worker processes used to encode the features', type=int, default=1)
+  arg.add_argument('--stats', help='Collect and print size statistics of the encoded features (slower)', action='store_true')
   args = arg.parse_args()
 
   pretyped_attributes = {}
@@ -413,25 +552,18 @@ if __name__ == "__main__":
     for pair in args.schema.split(','):
       name, atype = pair.split(':')
       pretyped_attributes[name] = type_map[atype]
-  total_feature_count = 0
-  total_vertex_size = 0
-  total_geometry_size = 0
-  total_attributes_size = 0
-  total_indices_size = 0
-  total_indices_count = 0
-  total_semantics_size = 0
-  total_boundaries_size = 0
-  total_shell_count = 0
-  total_solid_count = 0
-  total_surface_count = 0
-  total_ring_count = 0
-  convert_cjseq2cb(args.cjseq, args.cb, pretyped_attributes, not args.skip_null_attributes)
-  print("Total feature count:", total_feature_count)
-  print("Total vertex size:", total_vertex_size / 1024 / 1024)
-  print("Total attributes size:", total_attributes_size / 1024 / 1024)
-  print("Total geometry size:", total_geometry_size / 1024 / 1024)
-  print("Total indices size:", total_indices_size / 1024 / 1024)
-  print("Total indices count:", total_indices_count)
-  print("bytes per index:", total_indices_size / total_indices_count)
-  print("Total semantic objects size:", total_semantics_size / 1024 / 1024)
-  print("Total boundaries size:", total_boundaries_size / 1024 / 1024)
\ No newline at end of file
+  # the workers would inherit the flag and collect statistics that are then thrown away, so only enable it for jobs == 1
+  DEBUG_STATS = args.stats and args.jobs == 1
+  if args.stats and args.jobs > 1:
+    logging.warning("Size statistics can only be collected with --jobs 1, ignoring --stats")
+  convert_cjseq2cb(args.cjseq, args.cb, pretyped_attributes, not args.skip_null_attributes, args.jobs)
+  print("Total feature count:", stats.feature_count)
+  if DEBUG_STATS:
+    print("Total vertex size:", stats.vertex_size / 1024 / 1024)
+    print("Total attributes size:", stats.attributes_size / 1024 / 1024)
+    print("Total geometry size:", stats.geometry_size / 1024 / 1024)
+    print("Total indices size:", stats.indices_size / 1024 / 1024)
+    print("Total indices count:", stats.indices_count)
+    print("bytes per index:", stats.indices_size / stats.indices_count)
+    print("Total semantic objects size:", stats.semantics_size / 1024 / 1024)
+    print("Total boundaries size:", stats.boundaries_size / 1024 / 1024)
\ No newline at end of file
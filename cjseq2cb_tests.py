@@ -0,0 +1,97 @@
+# Copyright (c) 2024 TU Delft 3D geoinformation group, Ravi Peters (3DGI), Balazs Dukai (3DGI)
+#
+# This file is part of CityBuf
+#
+# CityBuf was created as part of the 3DBAG project by the TU Delft 3D geoinformation group (3d.bk.tudelf.nl) and 3DGI (3dgi.nl)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author(s):
+# Ravi Peters
+
+import os, tempfile
+import orjson
+import flatbuffers
+
+from cjseq2cb import convert_cjseq2cb, create_vertices_vector
+
+one_feature_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "one_feature.city.jsonl")
+
+# writes a CityJSON sequence with n copies of the feature in data/one_feature.city.jsonl. The feature at index
+# bad_index (if any) gets a list as attribute value, which can not be encoded
+def write_cjseq(path, n, bad_index=None):
+  with open(one_feature_path, "rb") as fo:
+    metadata_str = fo.readline()
+    cj_feature = orjson.loads(fo.readline())
+  cj_object = next(iter(cj_feature["CityObjects"].values()))
+  key = next(iter(cj_object["attributes"]))
+  value = cj_object["attributes"][key]
+  with open(path, "wb") as fo:
+    fo.write(metadata_str.rstrip(b"\n") + b"\n")
+    for i in range(n):
+      cj_object["attributes"][key] = [value] if i == bad_index else value
+      fo.write(orjson.dumps(cj_feature) + b"\n")
+
+def test_convert_failing_feature():
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    cjseq_path = os.path.join(tmp_dir, "bad.city.jsonl")
+    cb_path = os.path.join(tmp_dir, "bad.cb")
+    write_cjseq(cjseq_path, 100, bad_index=50)
+    try:
+      convert_cjseq2cb(cjseq_path, cb_path)
+    except Exception:
+      pass
+    else:
+      assert False, "Expected the conversion to fail"
+    # no (partial) output is left behind
+    assert os.listdir(tmp_dir) == ["bad.city.jsonl"]
+
+def test_convert_jobs():
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    cjseq_path = os.path.join(tmp_dir, "jobs.city.jsonl")
+    write_cjseq(cjseq_path, 3000)
+    convert_cjseq2cb(cjseq_path, os.path.join(tmp_dir, "jobs1.cb"), jobs=1)
+    convert_cjseq2cb(cjseq_path, os.path.join(tmp_dir, "jobs3.cb"), jobs=3)
+    with open(os.path.join(tmp_dir, "jobs1.cb"), "rb") as f1, open(os.path.join(tmp_dir, "jobs3.cb"), "rb") as f3:
+      assert f1.read() == f3.read()
+
+# a feature that fails to encode in one of the workers makes the conversion fail, instead of hanging it
+def test_convert_jobs_failing_feature():
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    cjseq_path = os.path.join(tmp_dir, "bad.city.jsonl")
+    cb_path = os.path.join(tmp_dir, "bad.cb")
+    write_cjseq(cjseq_path, 3000, bad_index=1500)
+    for _ in range(5):
+      try:
+        convert_cjseq2cb(cjseq_path, cb_path, jobs=4)
+      except Exception:
+        pass
+      else:
+        assert False, "Expected the conversion to fail"
+      assert os.listdir(tmp_dir) == ["bad.city.jsonl"]
+
+def test_float_vertices():
+  builder = flatbuffers.Builder(1024)
+  create_vertices_vector(builder, [[1, 2, 3], [4, 5, 6]])
+  try:
+    create_vertices_vector(builder, [[1.7, 2.2, 3.9]])
+  except Exception:
+    pass
+  else:
+    assert False, "Expected non-integer vertices to be rejected"
+
+if __name__ == "__main__":
+  test_convert_failing_feature()
+  test_convert_jobs()
+  test_convert_jobs_failing_feature()
+  test_float_vertices()
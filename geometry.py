@@ -20,6 +20,18 @@
 # Ravi Peters
 
 from CityBuf_.GeometryType import GeometryType
+import numpy as np
+
+# null values in the semantic values are encoded as the maximum value of a uint32
+SEMANTIC_NULL_VALUE = np.iinfo(np.uint32).max
+
+# converts a list of indices to a uint32 array. The dtype is checked first, since casting would silently truncate
+# non-integer values
+def to_uint32_array(values, name):
+  arr = np.asarray(values)
+  if len(arr) and arr.dtype.kind not in 'iu':
+    raise Exception(name + " must be integers")
+  return arr.astype(np.uint32, copy=False)
 
 class GeometryEncoder:
   def __init__(self):
@@ -30,10 +42,22 @@ class GeometryEncoder:
     self.indices = []
     self.semantic_values = []
 
+  # the recursion collects plain lists, which is the cheapest way to grow them. They are converted once at the end
+  # to uint32 numpy arrays, so the serializer can copy them without unboxing every value
   def encode(self, bounds):
+    d = self.encode_(bounds)
+    self.depth = d
+    self.solids = np.asarray(self.solids, dtype=np.uint32)
+    self.shells = np.asarray(self.shells, dtype=np.uint32)
+    self.surfaces = np.asarray(self.surfaces, dtype=np.uint32)
+    self.strings = np.asarray(self.strings, dtype=np.uint32)
+    self.indices = to_uint32_array(self.indices, "Boundary indices")
+    return d
+
+  def encode_(self, bounds):
     if type(bounds[0]) == list:
       for b in bounds:
-        d = self.encode(b)
+        d = self.encode_(b)
       l = len(bounds)
       if d == 1:
         self.surfaces.append(l)
@@ -46,14 +70,38 @@ class GeometryEncoder:
       self.indices += bounds
       self.strings.append(len(bounds))
       return 1 # depth
-    
+
+  # must be called after encode, the boundaries tell how deep the semantic values are nested and how many
+  # surfaces a null shell or solid covers
   def encode_semantics(self, semantic_values):
-    if type(semantic_values[0]) == list:
+    self.shell_cursor = 0
+    self.encode_semantics_(semantic_values, max(1, self.depth - 2))
+    self.semantic_values = to_uint32_array(self.semantic_values, "Semantic values")
+
+  # level is the nesting depth of semantic_values: 1 for a list of surface values, 2 for a list of shells, 3 for a
+  # list of solids
+  def encode_semantics_(self, semantic_values, level):
+    if level == 1:
+      if None in semantic_values:
+        self.semantic_values += [SEMANTIC_NULL_VALUE if sem is None else sem for sem in semantic_values]
+      else:
+        self.semantic_values += semantic_values
+    elif level == 2:
       for sem in semantic_values:
-        return self.encode_semantics(sem)
+        if sem is None: # a null shell, all its surfaces have no semantic object
+          self.semantic_values += [SEMANTIC_NULL_VALUE] * int(self.shells[self.shell_cursor])
+        else:
+          self.encode_semantics_(sem, 1)
+        self.shell_cursor += 1
     else:
-      self.semantic_values += semantic_values
-      return
+      for solid_i, sem in enumerate(semantic_values):
+        if sem is None: # a null solid, all the surfaces of its shells have no semantic object
+          n_shells = int(self.solids[solid_i])
+          n_surfaces = int(self.shells[self.shell_cursor:self.shell_cursor+n_shells].sum())
+          self.semantic_values += [SEMANTIC_NULL_VALUE] * n_surfaces
+          self.shell_cursor += n_shells
+        else:
+          self.encode_semantics_(sem, 2)
 
 # reverses the operation of the encoder
 class GeometryDecoder:
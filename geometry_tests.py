@@ -19,7 +19,7 @@
 # Author(s): 
 # Ravi Peters
 
-from geometry import GeometryEncoder, GeometryDecoder, GeometryType
+from geometry import GeometryEncoder, GeometryDecoder, GeometryType, SEMANTIC_NULL_VALUE
 
 compositesolid_testcase = GeometryType.CompositeSolid, [
   [ 
@@ -54,6 +54,58 @@ multilinestring_testcase = GeometryType.MultiLineString, [
   [2, 3, 5], [77, 55, 212]
 ]
 
+solid_semantics_testcase = GeometryType.Solid, [
+  [ [[0, 3, 2, 1]], [[4, 5, 6, 7]], [[0, 1, 5, 4]] ],
+  [ [[240, 243, 124]], [[244, 246, 724]]],
+  [ [[666, 667, 668]], [[74, 75, 76]]]
+], [
+  [0, 1, None],
+  [None, 2],
+  None
+], [
+  [0, 1, SEMANTIC_NULL_VALUE],
+  [SEMANTIC_NULL_VALUE, 2],
+  [SEMANTIC_NULL_VALUE, SEMANTIC_NULL_VALUE]
+]
+multisolid_semantics_testcase = GeometryType.MultiSolid, [
+  [ [ [[0, 3, 2, 1]], [[4, 5, 6, 7]] ] ],
+  [ [ [[240, 243, 124]] ], [ [[244, 246, 724]], [[34, 414, 45]] ] ]
+], [
+  [[0, None]],
+  None
+], [
+  [[0, SEMANTIC_NULL_VALUE]],
+  [[SEMANTIC_NULL_VALUE], [SEMANTIC_NULL_VALUE, SEMANTIC_NULL_VALUE]]
+]
+
+def test_semantics():
+  check_semantics(solid_semantics_testcase)
+  check_semantics(multisolid_semantics_testcase)
+
+def check_semantics(testcase):
+  t, bnds, values, expected = testcase
+  encoder = GeometryEncoder()
+  encoder.encode(bnds)
+  encoder.encode_semantics(values)
+  print("semantic_values: ", encoder.semantic_values)
+  decoder = GeometryDecoder(encoder.indices.tolist(), encoder.strings.tolist(), encoder.surfaces.tolist(), encoder.shells.tolist(), encoder.solids.tolist())
+  decoder.set_semantics(encoder.semantic_values.tolist())
+  ovalues = decoder.decode_semantics(t)
+  print("ovalues", ovalues)
+  assert ovalues == expected
+
+def test_float_values():
+  for bnds, values in (([[[0, 1.9, 2]]], None), ([[[0, 1, 2]]], [1.5])):
+    encoder = GeometryEncoder()
+    try:
+      encoder.encode(bnds)
+      if values:
+        encoder.encode_semantics(values)
+    except Exception:
+      pass
+    else:
+      assert False, "Expected non-integer values to be rejected"
+
 def test_all():
   test(compositesolid_testcase)
   test(multisolid_testcase)
@@ -73,9 +125,11 @@ def test(testcase):
   print("shells: ", encoder.shells)
   print("solids: ", encoder.solids)
   print("ibounds", bnds)
-  decoder = GeometryDecoder(encoder.indices, encoder.strings, encoder.surfaces, encoder.shells, encoder.solids)
+  decoder = GeometryDecoder(encoder.indices.tolist(), encoder.strings.tolist(), encoder.surfaces.tolist(), encoder.shells.tolist(), encoder.solids.tolist())
   obnds = decoder.decode(t)
   print("obounds", obnds)
   assert obnds == bnds
 
-test_all()
\ No newline at end of file
+test_all()
+test_semantics()
+test_float_values()